@@ -1,574 +1,868 @@
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import hashlib
+import threading
+import time
+from functools import lru_cache
+from itertools import chain, groupby
+from operator import itemgetter
+
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 
 from models import (
     Vehicle,
     MainGroupDefinition,
-    SubGroupDefinition,
     VehicleMainGroup,
     VehicleSubGroup,
     Diagram,
     Part,
-    PartWithContext,
     DiagramWithParts,
     VehicleSubGroupWithDiagrams,
     VehicleMainGroupWithSubGroups,
-    PartSearchResult,
-    MainGroupNested,
     VehicleOrder,
 )
 
+from services.cache import cached, clear_all
 from services.db import get_db
 
 router = APIRouter()
 
+# Hot SQL hoisted to module scope: passing the identical string object to
+# cursor.execute() guarantees hits in SQLite's per-connection statement
+# cache, skipping re-parse/re-plan on every request.
+_VEHICLE_SELECT = (
+    "SELECT vid, series, body, model, market, prod_month, engine, steering, "
+    "created_at FROM vehicles"
+)
+
+_SQL_GET_VEHICLES = _VEHICLE_SELECT + " ORDER BY created_at DESC"
+
+_SQL_GET_VEHICLE = _VEHICLE_SELECT + " WHERE vid = ?"
+
+# The whole tree in one denormalized query; LEFT JOINs keep main groups,
+# subgroups and diagrams without children in the result, and the ORDER BY
+# groups rows so a single groupby pass can rebuild the hierarchy. The
+# {parts_filter} slot takes the vehicle-order predicate below, so excluded
+# parts are discarded inside SQLite instead of being shipped to Python.
+_SQL_COMPLETE_TREE = """
+    SELECT vmg.id AS vmg_id, vmg.mg_number, mgd.mg_name, vmg.url,
+           vsg.id AS vsg_id, sgd.sg_number, sgd.sg_name,
+           d.id AS d_id, d.diagram_id, d.title, d.url AS d_url,
+           p.id AS p_id, p.position, p.description, p.part_number, p.quantity,
+           p.supplement, p.from_date, p.up_to_date, p.price, p.notes,
+           p.option_requirements, p.option_codes
+    FROM vehicle_main_groups vmg
+    JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
+    LEFT JOIN vehicle_subgroups vsg ON vsg.vehicle_mg_id = vmg.id
+    LEFT JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
+    LEFT JOIN diagrams d ON d.vehicle_subgroup_id = vsg.id
+    LEFT JOIN parts p ON p.diagram_id = d.id{parts_filter}
+    WHERE vmg.vid = ?{mg_filter}
+    ORDER BY vmg.mg_number_int, vmg.id, sgd.sg_number_int, vsg.id,
+             d.title, d.id, p.position_int
+"""
+
+# Optional scoping of the tree to one main group, or to a page of main
+# groups, so clients can bound response size and render incrementally.
+_SQL_MG_NUMBER_FILTER = " AND vmg.mg_number = ?"
+
+_SQL_MG_PAGE_FILTER = """ AND vmg.id IN (
+        SELECT id FROM vehicle_main_groups
+        WHERE vid = ? ORDER BY mg_number_int LIMIT ? OFFSET ?)"""
+
+# Pre-rendered /complete payloads, refreshed after ingest via the admin
+# endpoint. The unfiltered read then serves stored bytes with no join,
+# grouping or serialization work at request time.
+_SQL_COMPLETE_SNAPSHOT = "SELECT payload FROM vehicle_complete_json WHERE vid = ?"
+
+_SQL_COMPLETE_SNAPSHOT_UPSERT = """
+    INSERT INTO vehicle_complete_json (vid, payload, refreshed_at)
+    VALUES (?, ?, datetime('now'))
+    ON CONFLICT(vid) DO UPDATE SET
+        payload = excluded.payload,
+        refreshed_at = excluded.refreshed_at
+"""
+
+# A part is excluded when any of its option codes is marked "No" for a code
+# the vehicle order contains; option_codes is a JSON object column.
+_SQL_PARTS_ORDER_FILTER = """ AND (p.option_codes IS NULL
+        OR NOT EXISTS (
+            SELECT 1 FROM json_each(p.option_codes) je
+            WHERE je.value = 'No' AND je.key IN ({placeholders})))"""
+
+# All five summary counts share the vmg -> vsg -> d -> p join spine, so
+# compute them from a single traversal instead of five round trips.
+_SQL_SUMMARY_COUNTS = """
+    WITH s AS (
+        SELECT vmg.id AS vmg_id, vsg.id AS vsg_id, d.id AS d_id,
+               p.id AS p_id, p.part_number AS pn
+        FROM vehicle_main_groups vmg
+        LEFT JOIN vehicle_subgroups vsg ON vsg.vehicle_mg_id = vmg.id
+        LEFT JOIN diagrams d ON d.vehicle_subgroup_id = vsg.id
+        LEFT JOIN parts p ON p.diagram_id = d.id
+        WHERE vmg.vid = ?
+    )
+    SELECT COUNT(DISTINCT vmg_id) AS main_groups,
+           COUNT(DISTINCT vsg_id) AS subgroups,
+           COUNT(DISTINCT d_id) AS diagrams,
+           COUNT(p_id) AS total_parts,
+           COUNT(DISTINCT NULLIF(pn, '')) AS unique_parts
+    FROM s
+"""
+
+
+# Lookup SQL for the part/search endpoints, hoisted so cursor.execute()
+# always sees the identical string and hits the statement cache.
+_SQL_PARTS_BY_DIAGRAM = """
+    SELECT id, position, description, part_number, quantity,
+           supplement, from_date, up_to_date, price, notes,
+           option_requirements, option_codes
+    FROM parts
+    WHERE diagram_id = ?
+    ORDER BY position_int
+"""
+
+# Each search hit is serialized to JSON inside SQLite via json_object, so
+# the handler concatenates ready-made blobs instead of building a dict per
+# row in Python.
+_SEARCH_ROW_JSON = """json_object(
+        'id', pc.id, 'position', pc.position, 'description', pc.description,
+        'part_number', pc.part_number, 'quantity', pc.quantity,
+        'supplement', pc.supplement, 'from_date', pc.from_date,
+        'up_to_date', pc.up_to_date, 'price', pc.price, 'notes', pc.notes,
+        'option_requirements', pc.option_requirements,
+        'option_codes', pc.option_codes, 'diagram_title', pc.diagram_title,
+        'diagram_id', pc.diagram_id, 'sg_name', pc.sg_name,
+        'mg_name', pc.mg_name, 'vehicle_vid', pc.vehicle_vid)"""
+
+_SQL_SEARCH_PARTS = f"""
+    SELECT {_SEARCH_ROW_JSON} AS j, COUNT(*) OVER () AS total_count
+    FROM parts_fts f
+    JOIN parts_context pc ON pc.id = f.rowid
+    WHERE f.parts_fts MATCH ?
+    LIMIT ? OFFSET ?
+"""
+
+_SQL_SEARCH_PARTS_VID = f"""
+    SELECT {_SEARCH_ROW_JSON} AS j, COUNT(*) OVER () AS total_count
+    FROM parts_fts f
+    JOIN parts_context pc ON pc.id = f.rowid
+    WHERE f.parts_fts MATCH ?
+    AND pc.vehicle_vid = ?
+    LIMIT ? OFFSET ?
+"""
+
+_SQL_PART_BY_NUMBER = "SELECT * FROM parts_context WHERE part_number = ?"
+
+_SQL_PARTS_BY_OPTION = (
+    "SELECT pc.* FROM part_options po "
+    "JOIN parts_context pc ON pc.id = po.part_id "
+    "WHERE po.option_code = ?"
+)
+
+_SQL_PARTS_BY_OPTION_VID = _SQL_PARTS_BY_OPTION + " AND pc.vehicle_vid = ?"
+
+# Batch variants: one IN (...) probe for a whole list of keys instead of
+# one HTTP round trip and one query per key.
+_SQL_PARTS_BY_NUMBERS = "SELECT * FROM parts_context WHERE part_number IN ({placeholders})"
+
+_SQL_PARTS_BY_OPTION_CODES = (
+    "SELECT po.option_code, pc.* FROM part_options po "
+    "JOIN parts_context pc ON pc.id = po.part_id "
+    "WHERE po.option_code IN ({placeholders})"
+)
+
+_SQL_STATS = """
+    SELECT
+        (SELECT COUNT(*) FROM vehicles) AS vehicles,
+        (SELECT COUNT(*) FROM main_group_definitions) AS main_group_definitions,
+        (SELECT COUNT(*) FROM subgroup_definitions) AS subgroup_definitions,
+        (SELECT COUNT(*) FROM vehicle_main_groups) AS vehicle_main_groups,
+        (SELECT COUNT(*) FROM vehicle_subgroups) AS vehicle_subgroups,
+        (SELECT COUNT(*) FROM diagrams) AS diagrams,
+        (SELECT COUNT(*) FROM parts) AS parts,
+        (SELECT COUNT(*) FROM part_number_registry) AS unique_part_numbers
+"""
+
+
+# Definition/group/diagram lookups, hoisted like the rest of the module's
+# SQL so the statement cache sees one string per query shape.
+_SQL_MG_DEFINITIONS = (
+    "SELECT mg_number, mg_name, description FROM main_group_definitions "
+    "ORDER BY mg_number_int"
+)
+
+_SQL_MG_DEFINITION = (
+    "SELECT mg_number, mg_name, description FROM main_group_definitions "
+    "WHERE mg_number = ?"
+)
+
+_SQL_SG_DEFINITIONS = (
+    "SELECT id, mg_number, sg_number, sg_name FROM subgroup_definitions "
+    "ORDER BY mg_number_int, sg_number_int"
+)
+
+_SQL_SG_DEFINITIONS_FOR_MG = (
+    "SELECT id, mg_number, sg_number, sg_name FROM subgroup_definitions "
+    "WHERE mg_number = ? ORDER BY sg_number_int"
+)
+
+_SQL_VEHICLE_MAIN_GROUPS = """
+    SELECT vmg.id, vmg.vid, vmg.mg_number, vmg.url, mgd.mg_name
+    FROM vehicle_main_groups vmg
+    JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
+    WHERE vmg.vid = ?
+    ORDER BY vmg.mg_number_int
+"""
+
+_SQL_VEHICLE_MAIN_GROUP = """
+    SELECT vmg.id, vmg.vid, vmg.mg_number, vmg.url, mgd.mg_name
+    FROM vehicle_main_groups vmg
+    JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
+    WHERE vmg.vid = ? AND vmg.mg_number = ?
+"""
+
+_SQL_SUBGROUPS_FOR_MG_ID = """
+    SELECT vsg.id, vsg.vehicle_mg_id, sgd.sg_number, sgd.sg_name
+    FROM vehicle_subgroups vsg
+    JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
+    WHERE vsg.vehicle_mg_id = ?
+    ORDER BY sgd.sg_number_int
+"""
+
+_SQL_SUBGROUPS_FOR_VEHICLE_MG = """
+    SELECT vsg.id, vsg.vehicle_mg_id, sgd.sg_number, sgd.sg_name
+    FROM vehicle_subgroups vsg
+    JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
+    JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
+    WHERE vmg.vid = ? AND vmg.mg_number = ?
+    ORDER BY sgd.sg_number_int
+"""
+
+_SQL_VEHICLE_SUBGROUP = """
+    SELECT vsg.id, vsg.vehicle_mg_id, sgd.sg_number, sgd.sg_name
+    FROM vehicle_subgroups vsg
+    JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
+    WHERE vsg.id = ?
+"""
+
+_SQL_DIAGRAMS_FOR_VSG = (
+    "SELECT id, diagram_id, title, url FROM diagrams WHERE vehicle_subgroup_id = ?"
+)
 
-@router.get("/vehicles", response_model=List[Vehicle])
-def get_vehicles():
+_SQL_DIAGRAM = (
+    "SELECT id, vehicle_subgroup_id, diagram_id, title, url "
+    "FROM diagrams WHERE id = ?"
+)
+
+# The /full variant skips response validation, so the SELECT itself must
+# match the DiagramWithParts shape: no vehicle_subgroup_id, which the
+# Diagram response_model would otherwise have filtered out.
+_SQL_DIAGRAM_FULL = "SELECT id, diagram_id, title, url FROM diagrams WHERE id = ?"
+
+
+def _rows_to_dicts(cursor):
+    """Build plain dicts for fetched rows with one column-name lookup"""
+    cols = [d[0] for d in cursor.description]
+    return [dict(zip(cols, row)) for row in cursor.fetchall()]
+
+
+def _conditional_response(request: Request, body: bytes, max_age: int) -> Response:
+    """Serve pre-encoded JSON with an ETag, short-circuiting to 304 on a match"""
+    etag = 'W/"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={max_age}",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _iter_rows(cursor, size=500):
+    """Yield rows from a cursor in fixed-size batches to cap peak memory"""
+    while True:
+        batch = cursor.fetchmany(size)
+        if not batch:
+            return
+        yield from batch
+
+
+@cached(ttl=300)
+def _list_vehicles():
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM vehicles ORDER BY created_at DESC")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        cursor.execute(_SQL_GET_VEHICLES)
+        return _rows_to_dicts(cursor)
 
 
-@router.get("/vehicles/{vid}", response_model=Vehicle)
-def get_vehicle(vid: str):
+@router.get("/vehicles", response_model=None)
+async def get_vehicles():
+    # Run the blocking SQLite work in a worker thread so the event loop can
+    # keep serving other requests; serialize with orjson directly, which
+    # skips FastAPI's per-row model validation.
+    return ORJSONResponse(await asyncio.to_thread(_list_vehicles))
+
+
+@lru_cache(maxsize=1024)
+def _fetch_vehicle_row(vid: str):
+    """Cached vehicle metadata lookup; rows only change on catalog re-ingest"""
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM vehicles WHERE vid = ?", (vid,))
+        cursor.execute(_SQL_GET_VEHICLE, (vid,))
         row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Vehicle not found")
-        return dict(row)
+        return dict(row) if row else None
+
+
+def clear_caches():
+    """Drop the in-process lookup caches (catalog re-ingest, tests)"""
+    global _stats_value, _stats_expiry
+    _fetch_vehicle_row.cache_clear()
+    _main_group_definitions_body.cache_clear()
+    _subgroup_definitions_body.cache_clear()
+    _stats_value = None
+    _stats_expiry = 0.0
+    clear_all()
+
+
+@router.get("/vehicles/{vid}", response_model=Vehicle)
+def get_vehicle(vid: str):
+    vehicle = _fetch_vehicle_row(vid)
+    if not vehicle:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    return vehicle
+
+
+@router.get("/vehicles/{vid}/complete", response_model=None)
+def get_vehicle_complete_structure(
+    vid: str,
+    vehicleOrder: VehicleOrder,
+    request: Request,
+    mg_number: Optional[str] = Query(None, description="Limit to one main group"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum main groups"),
+    offset: int = Query(0, ge=0, description="Main-group offset for pagination"),
+):
+    vehicle = _fetch_vehicle_row(vid)
+    if not vehicle:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    # The tree is heavy to assemble but identical for identical inputs, so
+    # it sits behind the TTL cache keyed by vid/order/pagination, and the
+    # ETag lets repeat viewers skip the body transfer entirely.
+    order_codes = tuple(code.code for code in vehicleOrder.order_codes)
+    # The unfiltered tree is the common case; serve the pre-rendered
+    # snapshot when one has been materialized for this vehicle.
+    if not order_codes and mg_number is None and limit is None and offset == 0:
+        body = _complete_snapshot(vid)
+        if body is not None:
+            return _conditional_response(request, body, _COMPLETE_MAX_AGE)
+    tree = _complete_tree(vid, order_codes, mg_number, limit, offset)
+    return _conditional_response(request, orjson.dumps(tree), _COMPLETE_MAX_AGE)
+
+
+def _complete_snapshot(vid):
+    with get_db() as conn:
+        row = conn.execute(_SQL_COMPLETE_SNAPSHOT, (vid,)).fetchone()
+        return row["payload"].encode() if row else None
+
+
+@router.post("/admin/refresh/{vid}")
+async def refresh_vehicle_snapshot(vid: str):
+    """Rebuild and store the pre-rendered complete tree for one vehicle.
+
+    Meant to be called after (re-)ingesting a vehicle's catalog; until then
+    the /complete endpoint falls back to building the tree on demand.
+    """
+    vehicle = await asyncio.to_thread(_fetch_vehicle_row, vid)
+    if not vehicle:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    return await asyncio.to_thread(_refresh_complete_snapshot, vid)
 
 
-@router.get("/vehicles/{vid}/complete", response_model=List[MainGroupNested])
-def get_vehicle_complete_structure(vid: str, vehicleOrder: VehicleOrder):
+def _refresh_complete_snapshot(vid):
+    # Bypass the TTL cache so the stored payload reflects the live tables.
+    tree = _complete_tree.__wrapped__(vid, (), None, None, 0)
+    payload = orjson.dumps(tree).decode()
+    with get_db() as conn:
+        conn.execute(_SQL_COMPLETE_SNAPSHOT_UPSERT, (vid, payload))
+        conn.commit()
+    return {"vid": vid, "bytes": len(payload)}
+
+
+# A tight cap: entries are whole trees (megabytes each) and the key
+# includes client-supplied order codes and pagination, so a generous
+# bound would let junk bodies pin that much memory until expiry.
+@cached(ttl=900, max_entries=32)
+def _complete_tree(vid, order_codes, mg_number, limit, offset):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM vehicles WHERE vid = ?", (vid,))
-        vehicle = cursor.fetchone()
-        if not vehicle:
-            raise HTTPException(status_code=404, detail="Vehicle not found")
+        # Single denormalized query; rebuild the tree in one linear pass by
+        # grouping on each level's id as rows stream in. The vehicle-order
+        # filter is bound into the parts join so SQLite drops excluded parts
+        # before they reach Python.
+        if order_codes:
+            parts_filter = _SQL_PARTS_ORDER_FILTER.format(
+                placeholders=",".join("?" * len(order_codes)))
+        else:
+            parts_filter = ""
+        mg_filter = ""
+        mg_params = []
+        if mg_number is not None:
+            mg_filter += _SQL_MG_NUMBER_FILTER
+            mg_params.append(mg_number)
+        if limit is not None:
+            mg_filter += _SQL_MG_PAGE_FILTER
+            mg_params.extend((vid, limit, offset))
+        sql = _SQL_COMPLETE_TREE.format(parts_filter=parts_filter, mg_filter=mg_filter)
+        cursor.execute(sql, (*order_codes, vid, *mg_params))
+        rows = _iter_rows(cursor)
 
         result = []
-        cursor.execute("""
-            SELECT vmg.id as vmg_id, vmg.mg_number, mgd.mg_name, vmg.url
-            FROM vehicle_main_groups vmg
-            JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
-            WHERE vmg.vid = ?
-            ORDER BY CAST(vmg.mg_number AS INTEGER)
-        """, (vid,))
-        main_groups = cursor.fetchall()
-
-        for mg_row in main_groups:
-            mg_dict = dict(mg_row)
-            mg_id = mg_dict['vmg_id']
-
-            cursor.execute("""
-                SELECT vsg.id as vsg_id, sgd.sg_number, sgd.sg_name
-                FROM vehicle_subgroups vsg
-                JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
-                WHERE vsg.vehicle_mg_id = ?
-                ORDER BY CAST(sgd.sg_number AS INTEGER)
-            """, (mg_id,))
+        for _, mg_rows in groupby(rows, key=itemgetter('vmg_id')):
+            mg_first = next(mg_rows)
+            mg_rows = chain([mg_first], mg_rows)
 
-            subgroups = cursor.fetchall()
             sg_list = []
+            for vsg_id, sg_rows in groupby(mg_rows, key=itemgetter('vsg_id')):
+                sg_first = next(sg_rows)
+                if vsg_id is None:
+                    continue
+                sg_rows = chain([sg_first], sg_rows)
 
-            for sg_row in subgroups:
-                sg_dict = dict(sg_row)
-                vsg_id = sg_dict['vsg_id']
-
-                cursor.execute("""
-                    SELECT id, diagram_id, title, url
-                    FROM diagrams
-                    WHERE vehicle_subgroup_id = ?
-                    ORDER BY title
-                """, (vsg_id,))
-                diagrams = cursor.fetchall()
                 diag_list = []
-
-                for diag_row in diagrams:
-                    diag_dict = dict(diag_row)
-                    diag_db_id = diag_dict['id']
-
-                    cursor.execute("""
-                        SELECT id, position, description, part_number, quantity,
-                               supplement, from_date, up_to_date, price, notes,
-                               option_requirements, option_codes
-                        FROM parts
-                        WHERE diagram_id = ?
-                        ORDER BY CAST(position AS INTEGER)
-                    """, (diag_db_id,))
+                for d_id, diag_rows in groupby(sg_rows, key=itemgetter('d_id')):
+                    diag_first = next(diag_rows)
+                    if d_id is None:
+                        continue
 
                     parts = []
-                    part_rows = cursor.fetchall()
-
-                    for part_row in part_rows:
-                        part_dict = dict(part_row)
-                        if part_dict.get('option_codes'):
-                            part_option_codes = {}
-                            for code in part_dict['option_codes'].split(' '):
-                                code_split = code.strip().split('=')
-                                if len(code_split) == 2:
-                                    part_option_codes[code_split[0]] = code_split[1]
-                            vehicleOrder_codes = [code.code for code in vehicleOrder.order_codes]
-                            addPart = True
-                            for code, val in part_option_codes.items():
-                                if code in vehicleOrder_codes:
-                                    if val == "Yes":
-                                        continue
-                                    elif val == "No":
-                                        addPart = False
-                                        break
-                            if not addPart:
-                                continue
+                    for part_row in chain([diag_first], diag_rows):
+                        if part_row['p_id'] is None:
+                            continue
+                        part_dict = {
+                            'id': part_row['p_id'],
+                            'position': part_row['position'],
+                            'description': part_row['description'],
+                            'part_number': part_row['part_number'],
+                            'quantity': part_row['quantity'],
+                            'supplement': part_row['supplement'],
+                            'from_date': part_row['from_date'],
+                            'up_to_date': part_row['up_to_date'],
+                            'price': part_row['price'],
+                            'notes': part_row['notes'],
+                            'option_requirements': part_row['option_requirements'],
+                            'option_codes': part_row['option_codes'],
+                        }
                         parts.append(part_dict)
 
                     diag_list.append({
-                        'id': diag_dict['id'],
-                        'diagram_id': diag_dict['diagram_id'],
-                        'title': diag_dict['title'],
-                        'url': diag_dict['url'],
+                        'id': diag_first['d_id'],
+                        'diagram_id': diag_first['diagram_id'],
+                        'title': diag_first['title'],
+                        'url': diag_first['d_url'],
                         'parts': parts
                     })
 
                 sg_list.append({
-                    'sg_number': sg_dict['sg_number'],
-                    'sg_name': sg_dict['sg_name'],
+                    'sg_number': sg_first['sg_number'],
+                    'sg_name': sg_first['sg_name'],
                     'diagrams': diag_list
                 })
 
             result.append({
-                'mg_number': mg_dict['mg_number'],
-                'mg_name': mg_dict['mg_name'],
-                'url': mg_dict['url'],
+                'mg_number': mg_first['mg_number'],
+                'mg_name': mg_first['mg_name'],
+                'url': mg_first['url'],
                 'subgroups': sg_list
             })
 
         return result
 
 
+def _summary_counts(vid: str):
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(_SQL_SUMMARY_COUNTS, (vid,))
+        return cursor.fetchone()
+
+
 @router.get("/vehicles/{vid}/complete/summary")
-def get_vehicle_complete_summary(vid: str):
+async def get_vehicle_complete_summary(vid: str):
+    vehicle = await asyncio.to_thread(_fetch_vehicle_row, vid)
+    if not vehicle:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    counts = await asyncio.to_thread(_summary_counts, vid)
+
+    return {
+        "vid": vid,
+        "vehicle": vehicle,
+        "main_groups": counts['main_groups'],
+        "subgroups": counts['subgroups'],
+        "diagrams": counts['diagrams'],
+        "total_parts": counts['total_parts'],
+        "unique_part_numbers": counts['unique_parts']
+    }
+
+
+# Definitions only change on catalog updates, so cache the encoded JSON
+# bytes in-process; repeat requests skip SQLite and serialization entirely
+# and usually collapse to a 304 via the ETag.
+_DEFINITIONS_MAX_AGE = 86400
+
+# Part/vehicle lookups change on re-ingest; keep client caches short-lived.
+_LOOKUP_MAX_AGE = 300
+
+# The complete tree matches its server-side cache window.
+_COMPLETE_MAX_AGE = 900
+
+
+@lru_cache(maxsize=1)
+def _main_group_definitions_body() -> bytes:
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM vehicles WHERE vid = ?", (vid,))
-        vehicle = cursor.fetchone()
-        if not vehicle:
-            raise HTTPException(status_code=404, detail="Vehicle not found")
-
-        cursor.execute("SELECT COUNT(*) as count FROM vehicle_main_groups WHERE vid = ?", (vid,))
-        mg_count = cursor.fetchone()['count']
-
-        cursor.execute("""
-            SELECT COUNT(*) as count
-            FROM vehicle_subgroups vsg
-            JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
-            WHERE vmg.vid = ?
-        """, (vid,))
-        sg_count = cursor.fetchone()['count']
-
-        cursor.execute("""
-            SELECT COUNT(*) as count
-            FROM diagrams d
-            JOIN vehicle_subgroups vsg ON d.vehicle_subgroup_id = vsg.id
-            JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
-            WHERE vmg.vid = ?
-        """, (vid,))
-        diag_count = cursor.fetchone()['count']
-
-        cursor.execute("""
-            SELECT COUNT(*) as count
-            FROM parts p
-            JOIN diagrams d ON p.diagram_id = d.id
-            JOIN vehicle_subgroups vsg ON d.vehicle_subgroup_id = vsg.id
-            JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
-            WHERE vmg.vid = ?
-        """, (vid,))
-        parts_count = cursor.fetchone()['count']
-
-        cursor.execute("""
-            SELECT COUNT(DISTINCT p.part_number) as count
-            FROM parts p
-            JOIN diagrams d ON p.diagram_id = d.id
-            JOIN vehicle_subgroups vsg ON d.vehicle_subgroup_id = vsg.id
-            JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
-            WHERE vmg.vid = ? AND p.part_number != ''
-        """, (vid,))
-        unique_parts = cursor.fetchone()['count']
-
-        return {
-            "vid": vid,
-            "vehicle": dict(vehicle),
-            "main_groups": mg_count,
-            "subgroups": sg_count,
-            "diagrams": diag_count,
-            "total_parts": parts_count,
-            "unique_part_numbers": unique_parts
-        }
-
-
-@router.get("/main-groups/definitions", response_model=List[MainGroupDefinition])
-def get_main_group_definitions():
+        cursor.execute(_SQL_MG_DEFINITIONS)
+        return orjson.dumps(_rows_to_dicts(cursor))
+
+
+@lru_cache(maxsize=128)
+def _subgroup_definitions_body(mg_number: Optional[str]) -> bytes:
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT mg_number, mg_name, description FROM main_group_definitions ORDER BY CAST(mg_number AS INTEGER)")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        if mg_number:
+            cursor.execute(_SQL_SG_DEFINITIONS_FOR_MG, (mg_number,))
+        else:
+            cursor.execute(_SQL_SG_DEFINITIONS)
+        return orjson.dumps(_rows_to_dicts(cursor))
+
+
+@router.get("/main-groups/definitions", response_model=None)
+def get_main_group_definitions(request: Request):
+    return _conditional_response(
+        request, _main_group_definitions_body(), _DEFINITIONS_MAX_AGE)
 
 
 @router.get("/main-groups/definitions/{mg_number}", response_model=MainGroupDefinition)
 def get_main_group_definition(mg_number: str):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT mg_number, mg_name, description FROM main_group_definitions WHERE mg_number = ?", (mg_number,))
+        cursor.execute(_SQL_MG_DEFINITION, (mg_number,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Main group definition not found")
         return dict(row)
 
 
-@router.get("/subgroups/definitions", response_model=List[SubGroupDefinition])
-def get_subgroup_definitions(mg_number: Optional[str] = None):
-    with get_db() as conn:
-        cursor = conn.cursor()
-        if mg_number:
-            cursor.execute("SELECT id, mg_number, sg_number, sg_name FROM subgroup_definitions WHERE mg_number = ? ORDER BY CAST(sg_number AS INTEGER)", (mg_number,))
-        else:
-            cursor.execute("SELECT id, mg_number, sg_number, sg_name FROM subgroup_definitions ORDER BY CAST(mg_number AS INTEGER), CAST(sg_number AS INTEGER)")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+@router.get("/subgroups/definitions", response_model=None)
+def get_subgroup_definitions(request: Request, mg_number: Optional[str] = None):
+    return _conditional_response(
+        request, _subgroup_definitions_body(mg_number), _DEFINITIONS_MAX_AGE)
 
 
-@router.get("/vehicles/{vid}/main-groups", response_model=List[VehicleMainGroup])
+@router.get("/vehicles/{vid}/main-groups", response_model=None)
 def get_vehicle_main_groups(vid: str):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT vmg.id, vmg.vid, vmg.mg_number, vmg.url, mgd.mg_name
-            FROM vehicle_main_groups vmg
-            JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
-            WHERE vmg.vid = ?
-            ORDER BY CAST(vmg.mg_number AS INTEGER)
-        """, (vid,))
-        rows = cursor.fetchall()
+        cursor.execute(_SQL_VEHICLE_MAIN_GROUPS, (vid,))
+        rows = _rows_to_dicts(cursor)
         if not rows:
             raise HTTPException(status_code=404, detail="No main groups found for this vehicle")
-        return [dict(row) for row in rows]
+        return ORJSONResponse(rows)
 
 
 @router.get("/vehicles/{vid}/main-groups/{mg_number}", response_model=VehicleMainGroup)
 def get_vehicle_main_group(vid: str, mg_number: str):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT vmg.id, vmg.vid, vmg.mg_number, vmg.url, mgd.mg_name
-            FROM vehicle_main_groups vmg
-            JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
-            WHERE vmg.vid = ? AND vmg.mg_number = ?
-        """, (vid, mg_number))
+        cursor.execute(_SQL_VEHICLE_MAIN_GROUP, (vid, mg_number))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Main group not found for this vehicle")
         return dict(row)
 
 
-@router.get("/vehicles/{vid}/main-groups/{mg_number}/full", response_model=VehicleMainGroupWithSubGroups)
+# The remaining list-heavy endpoints return trusted DB rows, so Pydantic
+# re-validation is pure overhead; response_model=None skips the per-row
+# model construction while responses= keeps the schema in the OpenAPI docs.
+@router.get("/vehicles/{vid}/main-groups/{mg_number}/full", response_model=None,
+            responses={200: {"model": VehicleMainGroupWithSubGroups}})
 def get_vehicle_main_group_full(vid: str, mg_number: str):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT vmg.id, vmg.vid, vmg.mg_number, vmg.url, mgd.mg_name
-            FROM vehicle_main_groups vmg
-            JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
-            WHERE vmg.vid = ? AND vmg.mg_number = ?
-        """, (vid, mg_number))
+        cursor.execute(_SQL_VEHICLE_MAIN_GROUP, (vid, mg_number))
         mg_row = cursor.fetchone()
         if not mg_row:
             raise HTTPException(status_code=404, detail="Main group not found for this vehicle")
         mg = dict(mg_row)
-        cursor.execute("""
-            SELECT vsg.id, vsg.vehicle_mg_id, sgd.sg_number, sgd.sg_name
-            FROM vehicle_subgroups vsg
-            JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
-            WHERE vsg.vehicle_mg_id = ?
-            ORDER BY CAST(sgd.sg_number AS INTEGER)
-        """, (mg['id'],))
-        sg_rows = cursor.fetchall()
-        mg['subgroups'] = [dict(row) for row in sg_rows]
+        cursor.execute(_SQL_SUBGROUPS_FOR_MG_ID, (mg['id'],))
+        mg['subgroups'] = _rows_to_dicts(cursor)
         return mg
 
 
-@router.get("/vehicles/{vid}/main-groups/{mg_number}/subgroups", response_model=List[VehicleSubGroup])
+@router.get("/vehicles/{vid}/main-groups/{mg_number}/subgroups", response_model=None,
+            responses={200: {"model": List[VehicleSubGroup]}})
 def get_vehicle_subgroups(vid: str, mg_number: str):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT vsg.id, vsg.vehicle_mg_id, sgd.sg_number, sgd.sg_name
-            FROM vehicle_subgroups vsg
-            JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
-            JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
-            WHERE vmg.vid = ? AND vmg.mg_number = ?
-            ORDER BY CAST(sgd.sg_number AS INTEGER)
-        """, (vid, mg_number))
-        rows = cursor.fetchall()
+        cursor.execute(_SQL_SUBGROUPS_FOR_VEHICLE_MG, (vid, mg_number))
+        rows = _rows_to_dicts(cursor)
         if not rows:
             raise HTTPException(status_code=404, detail="No subgroups found")
-        return [dict(row) for row in rows]
+        return rows
 
 
 @router.get("/vehicle-subgroups/{vsg_id}", response_model=VehicleSubGroup)
 def get_vehicle_subgroup(vsg_id: int):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT vsg.id, vsg.vehicle_mg_id, sgd.sg_number, sgd.sg_name
-            FROM vehicle_subgroups vsg
-            JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
-            WHERE vsg.id = ?
-        """, (vsg_id,))
+        cursor.execute(_SQL_VEHICLE_SUBGROUP, (vsg_id,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Vehicle subgroup not found")
         return dict(row)
 
 
-@router.get("/vehicle-subgroups/{vsg_id}/full", response_model=VehicleSubGroupWithDiagrams)
+@router.get("/vehicle-subgroups/{vsg_id}/full", response_model=None,
+            responses={200: {"model": VehicleSubGroupWithDiagrams}})
 def get_vehicle_subgroup_full(vsg_id: int):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT vsg.id, vsg.vehicle_mg_id, sgd.sg_number, sgd.sg_name
-            FROM vehicle_subgroups vsg
-            JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
-            WHERE vsg.id = ?
-        """, (vsg_id,))
+        cursor.execute(_SQL_VEHICLE_SUBGROUP, (vsg_id,))
         sg_row = cursor.fetchone()
         if not sg_row:
             raise HTTPException(status_code=404, detail="Vehicle subgroup not found")
         sg = dict(sg_row)
-        cursor.execute("SELECT id, diagram_id, title, url FROM diagrams WHERE vehicle_subgroup_id = ?", (vsg_id,))
-        diag_rows = cursor.fetchall()
-        sg['diagrams'] = [dict(row) for row in diag_rows]
+        cursor.execute(_SQL_DIAGRAMS_FOR_VSG, (vsg_id,))
+        sg['diagrams'] = _rows_to_dicts(cursor)
         return sg
 
 
-@router.get("/vehicle-subgroups/{vsg_id}/diagrams", response_model=List[Diagram])
+@router.get("/vehicle-subgroups/{vsg_id}/diagrams", response_model=None)
 def get_diagrams(vsg_id: int):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT id, diagram_id, title, url FROM diagrams WHERE vehicle_subgroup_id = ?", (vsg_id,))
-        rows = cursor.fetchall()
+        cursor.execute(_SQL_DIAGRAMS_FOR_VSG, (vsg_id,))
+        rows = _rows_to_dicts(cursor)
         if not rows:
             raise HTTPException(status_code=404, detail="No diagrams found")
-        return [dict(row) for row in rows]
+        return ORJSONResponse(rows)
 
 
 @router.get("/diagrams/{diagram_db_id}", response_model=Diagram)
 def get_diagram(diagram_db_id: int):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM diagrams WHERE id = ?", (diagram_db_id,))
+        cursor.execute(_SQL_DIAGRAM, (diagram_db_id,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Diagram not found")
         return dict(row)
 
 
-@router.get("/diagrams/{diagram_db_id}/full", response_model=DiagramWithParts)
+@router.get("/diagrams/{diagram_db_id}/full", response_model=None,
+            responses={200: {"model": DiagramWithParts}})
 def get_diagram_full(diagram_db_id: int):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM diagrams WHERE id = ?", (diagram_db_id,))
+        cursor.execute(_SQL_DIAGRAM_FULL, (diagram_db_id,))
         diag_row = cursor.fetchone()
         if not diag_row:
             raise HTTPException(status_code=404, detail="Diagram not found")
         diag = dict(diag_row)
-        cursor.execute("""
-            SELECT id, position, description, part_number, quantity,
-                   supplement, from_date, up_to_date, price, notes,
-                   option_requirements, option_codes
-            FROM parts 
-            WHERE diagram_id = ?
-            ORDER BY CAST(position AS INTEGER)
-        """, (diagram_db_id,))
-        part_rows = cursor.fetchall()
-        diag['parts'] = [dict(row) for row in part_rows]
+        cursor.execute(_SQL_PARTS_BY_DIAGRAM, (diagram_db_id,))
+        diag['parts'] = _rows_to_dicts(cursor)
         return diag
 
 
-@router.get("/diagrams/{diagram_db_id}/parts", response_model=List[Part])
-def get_parts(diagram_db_id: int):
+@cached(ttl=300)
+def _parts_by_diagram(diagram_db_id: int):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, position, description, part_number, quantity,
-                   supplement, from_date, up_to_date, price, notes,
-                   option_requirements, option_codes
-            FROM parts 
-            WHERE diagram_id = ?
-            ORDER BY CAST(position AS INTEGER)
-        """, (diagram_db_id,))
-        rows = cursor.fetchall()
+        cursor.execute(_SQL_PARTS_BY_DIAGRAM, (diagram_db_id,))
+        rows = _rows_to_dicts(cursor)
         if not rows:
             raise HTTPException(status_code=404, detail="No parts found")
-        return [dict(row) for row in rows]
+        return rows
+
+
+@router.get("/diagrams/{diagram_db_id}/parts", response_model=None,
+            responses={200: {"model": List[Part]}})
+async def get_parts(diagram_db_id: int):
+    # Blocking SQLite work runs on a worker thread so the event loop stays
+    # free; the cached sync helper keeps repeat hits off the database.
+    return await asyncio.to_thread(_parts_by_diagram, diagram_db_id)
 
 
-@router.get("/parts/search", response_model=PartSearchResult)
-def search_parts(
+@router.get("/parts/search", response_model=None)
+async def search_parts(
     q: str = Query(..., min_length=3, description="Search query"),
     vid: Optional[str] = Query(None, description="Filter by vehicle VID"),
     limit: int = Query(50, ge=1, le=500, description="Maximum results"),
     offset: int = Query(0, ge=0, description="Offset for pagination")
 ):
+    return await asyncio.to_thread(_search_parts, q, vid, limit, offset)
+
+
+def _search_parts(q, vid, limit, offset):
     with get_db() as conn:
         cursor = conn.cursor()
-        search_term = f"%{q}%"
+        # Prefix-phrase MATCH against the FTS5 index (see services.db) instead
+        # of a leading-wildcard LIKE, which scanned the whole parts table.
+        match_term = '"{}"*'.format(q.replace('"', '""'))
+        # COUNT(*) OVER () carries the unpaginated total on every row, so
+        # one query serves both the page and the count instead of running
+        # the match twice.
         if vid:
-            cursor.execute("""
-                SELECT COUNT(*) as total
-                FROM parts p
-                JOIN diagrams d ON p.diagram_id = d.id
-                JOIN vehicle_subgroups vsg ON d.vehicle_subgroup_id = vsg.id
-                JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
-                WHERE (p.description LIKE ? OR p.part_number LIKE ?)
-                AND vmg.vid = ?
-            """, (search_term, search_term, vid))
-            total = cursor.fetchone()['total']
-            cursor.execute("""
-                SELECT 
-                    p.id, p.position, p.description, p.part_number, p.quantity,
-                    p.supplement, p.from_date, p.up_to_date, p.price, p.notes,
-                    p.option_requirements, p.option_codes,
-                    d.title as diagram_title, d.diagram_id,
-                    sgd.sg_name, mgd.mg_name, vmg.vid as vehicle_vid
-                FROM parts p
-                JOIN diagrams d ON p.diagram_id = d.id
-                JOIN vehicle_subgroups vsg ON d.vehicle_subgroup_id = vsg.id
-                JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
-                JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
-                JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
-                WHERE (p.description LIKE ? OR p.part_number LIKE ?)
-                AND vmg.vid = ?
-                LIMIT ? OFFSET ?
-            """, (search_term, search_term, vid, limit, offset))
+            cursor.execute(_SQL_SEARCH_PARTS_VID, (match_term, vid, limit, offset))
         else:
-            cursor.execute("SELECT COUNT(*) as total FROM parts p WHERE p.description LIKE ? OR p.part_number LIKE ?", (search_term, search_term))
-            total = cursor.fetchone()['total']
-            cursor.execute("""
-                SELECT 
-                    p.id, p.position, p.description, p.part_number, p.quantity,
-                    p.supplement, p.from_date, p.up_to_date, p.price, p.notes,
-                    p.option_requirements, p.option_codes,
-                    d.title as diagram_title, d.diagram_id,
-                    sgd.sg_name, mgd.mg_name, vmg.vid as vehicle_vid
-                FROM parts p
-                JOIN diagrams d ON p.diagram_id = d.id
-                JOIN vehicle_subgroups vsg ON d.vehicle_subgroup_id = vsg.id
-                JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
-                JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
-                JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
-                WHERE p.description LIKE ? OR p.part_number LIKE ?
-                LIMIT ? OFFSET ?
-            """, (search_term, search_term, limit, offset))
+            cursor.execute(_SQL_SEARCH_PARTS, (match_term, limit, offset))
         rows = cursor.fetchall()
-        return {"total": total, "parts": [dict(row) for row in rows]}
+        total = rows[0]["total_count"] if rows else 0
+        body = b'{"total":%d,"parts":[%s]}' % (
+            total, b",".join(row["j"].encode() for row in rows))
+        return Response(content=body, media_type="application/json")
+
+
+def _split_csv(raw: str):
+    return [item.strip() for item in raw.split(",") if item.strip()]
+
+
+@router.get("/parts", response_model=None)
+async def get_parts_batch(
+    numbers: str = Query(..., description="Comma-separated part numbers")
+):
+    return await asyncio.to_thread(_parts_batch, numbers)
 
 
-@router.get("/parts/{part_number}", response_model=List[PartWithContext])
-def get_part_by_number(part_number: str):
+def _parts_batch(numbers: str):
+    wanted = _split_csv(numbers)
+    if not wanted:
+        raise HTTPException(status_code=400, detail="No part numbers given")
+    grouped = {number: [] for number in wanted}
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT 
-                p.id, p.position, p.description, p.part_number, p.quantity,
-                p.supplement, p.from_date, p.up_to_date, p.price, p.notes,
-                p.option_requirements, p.option_codes,
-                d.title as diagram_title, d.diagram_id,
-                sgd.sg_name, mgd.mg_name,
-                vmg.vid as vehicle_vid
-            FROM parts p
-            JOIN diagrams d ON p.diagram_id = d.id
-            JOIN vehicle_subgroups vsg ON d.vehicle_subgroup_id = vsg.id
-            JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
-            JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
-            JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
-            WHERE p.part_number = ?
-        """, (part_number,))
-        rows = cursor.fetchall()
+        cursor.execute(
+            _SQL_PARTS_BY_NUMBERS.format(placeholders=",".join("?" * len(wanted))),
+            wanted)
+        for row in _rows_to_dicts(cursor):
+            grouped[row["part_number"]].append(row)
+    return grouped
+
+
+@router.get("/options", response_model=None)
+async def get_options_batch(
+    codes: str = Query(..., description="Comma-separated option codes")
+):
+    return await asyncio.to_thread(_options_batch, codes)
+
+
+def _options_batch(codes: str):
+    wanted = _split_csv(codes)
+    if not wanted:
+        raise HTTPException(status_code=400, detail="No option codes given")
+    grouped = {code: [] for code in wanted}
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            _SQL_PARTS_BY_OPTION_CODES.format(placeholders=",".join("?" * len(wanted))),
+            wanted)
+        for row in _rows_to_dicts(cursor):
+            grouped[row.pop("option_code")].append(row)
+    return grouped
+
+
+@cached(ttl=300)
+def _part_by_number(part_number: str):
+    # parts_context (see services.db) pre-joins the diagram/subgroup/
+    # main-group/vehicle context, so this is a single indexed lookup.
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(_SQL_PART_BY_NUMBER, (part_number,))
+        rows = _rows_to_dicts(cursor)
         if not rows:
             raise HTTPException(status_code=404, detail="Part not found")
-        return [dict(row) for row in rows]
+        return rows
+
 
+@router.get("/parts/{part_number}", response_model=None)
+async def get_part_by_number(part_number: str, request: Request):
+    rows = await asyncio.to_thread(_part_by_number, part_number)
+    return _conditional_response(request, orjson.dumps(rows), _LOOKUP_MAX_AGE)
 
-@router.get("/options/{option_code}", response_model=List[PartWithContext])
-def get_parts_by_option(option_code: str, vid: Optional[str] = None):
+
+@cached(ttl=300)
+def _parts_by_option(option_code: str, vid: Optional[str]):
     with get_db() as conn:
         cursor = conn.cursor()
+        # part_options (see services.db) holds one row per part/option code,
+        # so this is an equality probe instead of a LIKE scan over JSON text.
         if vid:
-            cursor.execute("""
-                SELECT 
-                    p.id, p.position, p.description, p.part_number, p.quantity,
-                    p.supplement, p.from_date, p.up_to_date, p.price, p.notes,
-                    p.option_requirements, p.option_codes,
-                    d.title as diagram_title, d.diagram_id,
-                    sgd.sg_name, mgd.mg_name, vmg.vid as vehicle_vid
-                FROM parts p
-                JOIN diagrams d ON p.diagram_id = d.id
-                JOIN vehicle_subgroups vsg ON d.vehicle_subgroup_id = vsg.id
-                JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
-                JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
-                JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
-                WHERE p.option_codes LIKE ? AND vmg.vid = ?
-            """, (f"%{option_code}%", vid))
+            cursor.execute(_SQL_PARTS_BY_OPTION_VID, (option_code, vid))
         else:
-            cursor.execute("""
-                SELECT 
-                    p.id, p.position, p.description, p.part_number, p.quantity,
-                    p.supplement, p.from_date, p.up_to_date, p.price, p.notes,
-                    p.option_requirements, p.option_codes,
-                    d.title as diagram_title, d.diagram_id,
-                    sgd.sg_name, mgd.mg_name, vmg.vid as vehicle_vid
-                FROM parts p
-                JOIN diagrams d ON p.diagram_id = d.id
-                JOIN vehicle_subgroups vsg ON d.vehicle_subgroup_id = vsg.id
-                JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
-                JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
-                JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
-                WHERE p.option_codes LIKE ?
-            """, (f"%{option_code}%",))
-        rows = cursor.fetchall()
+            cursor.execute(_SQL_PARTS_BY_OPTION, (option_code,))
+        rows = _rows_to_dicts(cursor)
         if not rows:
             raise HTTPException(status_code=404, detail="No parts found for this option")
-        return [dict(row) for row in rows]
+        return rows
+
+
+@router.get("/options/{option_code}", response_model=None)
+async def get_parts_by_option(
+    option_code: str, request: Request, vid: Optional[str] = None
+):
+    rows = await asyncio.to_thread(_parts_by_option, option_code, vid)
+    return _conditional_response(request, orjson.dumps(rows), _LOOKUP_MAX_AGE)
+
+
+# Columns clients may project via ?fields=; also the default SELECT list,
+# spelled out so DISTINCT sorts narrow rows instead of every column.
+_VEHICLE_COLUMNS = (
+    "vid", "series", "body", "model", "market", "prod_month",
+    "engine", "steering", "created_at",
+)
+
+
+def _vehicle_select(fields: Optional[str]) -> str:
+    if fields is None:
+        cols = _VEHICLE_COLUMNS
+    else:
+        cols = tuple(f.strip() for f in fields.split(",") if f.strip())
+        if not cols or set(cols) - set(_VEHICLE_COLUMNS):
+            raise HTTPException(status_code=400, detail="Unknown vehicle field")
+    return ", ".join("v." + col for col in cols)
 
 
-@router.get("/main-groups/{mg_number}/vehicles", response_model=List[Vehicle])
-def get_vehicles_with_main_group(mg_number: str):
+@cached(ttl=300)
+def _vehicles_with_main_group(mg_number: str, fields: Optional[str]):
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT DISTINCT v.*
+        cursor.execute(f"""
+            SELECT DISTINCT {_vehicle_select(fields)}
             FROM vehicles v
             JOIN vehicle_main_groups vmg ON v.vid = vmg.vid
             WHERE vmg.mg_number = ?
             ORDER BY v.created_at DESC
         """, (mg_number,))
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        return _rows_to_dicts(cursor)
+
+
+@router.get("/main-groups/{mg_number}/vehicles", response_model=None)
+async def get_vehicles_with_main_group(
+    mg_number: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated vehicle columns"),
+):
+    rows = await asyncio.to_thread(_vehicles_with_main_group, mg_number, fields)
+    return _conditional_response(request, orjson.dumps(rows), _LOOKUP_MAX_AGE)
 
 
-@router.get("/subgroups/{sg_number}/vehicles", response_model=List[Vehicle])
-def get_vehicles_with_subgroup(sg_number: str, mg_number: Optional[str] = None):
+@cached(ttl=300)
+def _vehicles_with_subgroup(sg_number: str, mg_number: Optional[str], fields: Optional[str]):
     with get_db() as conn:
         cursor = conn.cursor()
         if mg_number:
-            cursor.execute("""
-                SELECT DISTINCT v.*
+            cursor.execute(f"""
+                SELECT DISTINCT {_vehicle_select(fields)}
                 FROM vehicles v
                 JOIN vehicle_main_groups vmg ON v.vid = vmg.vid
                 JOIN vehicle_subgroups vsg ON vmg.id = vsg.vehicle_mg_id
@@ -577,8 +871,8 @@ def get_vehicles_with_subgroup(sg_number: str, mg_number: Optional[str] = None):
                 ORDER BY v.created_at DESC
             """, (sg_number, mg_number))
         else:
-            cursor.execute("""
-                SELECT DISTINCT v.*
+            cursor.execute(f"""
+                SELECT DISTINCT {_vehicle_select(fields)}
                 FROM vehicles v
                 JOIN vehicle_main_groups vmg ON v.vid = vmg.vid
                 JOIN vehicle_subgroups vsg ON vmg.id = vsg.vehicle_mg_id
@@ -586,37 +880,57 @@ def get_vehicles_with_subgroup(sg_number: str, mg_number: Optional[str] = None):
                 WHERE sgd.sg_number = ?
                 ORDER BY v.created_at DESC
             """, (sg_number,))
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        return _rows_to_dicts(cursor)
+
+
+@router.get("/subgroups/{sg_number}/vehicles", response_model=None)
+async def get_vehicles_with_subgroup(
+    sg_number: str,
+    request: Request,
+    mg_number: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated vehicle columns"),
+):
+    rows = await asyncio.to_thread(_vehicles_with_subgroup, sg_number, mg_number, fields)
+    return _conditional_response(request, orjson.dumps(rows), _LOOKUP_MAX_AGE)
+
+
+# Catalog-wide counts only move on re-ingest, so a short TTL keeps the
+# COUNT(DISTINCT part_number) sort off the request path for repeat calls.
+_STATS_TTL = 60
+
+_STATS_REFRESH_INTERVAL = 60.0
+
+
+async def refresh_stats_loop(interval: float = _STATS_REFRESH_INTERVAL):
+    """Keep the /stats snapshot warm so no request ever pays the aggregation.
+
+    Started from the app lifespan; the double-interval expiry means a
+    request only recomputes inline if the refresher has fallen behind.
+    """
+    global _stats_value, _stats_expiry
+    while True:
+        _stats_value = await asyncio.to_thread(_compute_stats)
+        _stats_expiry = time.monotonic() + 2 * interval
+        await asyncio.sleep(interval)
+_stats_lock = threading.Lock()
+_stats_value = None
+_stats_expiry = 0.0
 
 
 @router.get("/stats")
 def get_statistics():
+    global _stats_value, _stats_expiry
+    if _stats_value is None or time.monotonic() >= _stats_expiry:
+        with _stats_lock:
+            if _stats_value is None or time.monotonic() >= _stats_expiry:
+                _stats_value = _compute_stats()
+                _stats_expiry = time.monotonic() + _STATS_TTL
+    return _stats_value
+
+
+def _compute_stats():
+    # One prepare/step for the whole report instead of eight round trips.
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) as count FROM vehicles")
-        vehicles = cursor.fetchone()['count']
-        cursor.execute("SELECT COUNT(*) as count FROM main_group_definitions")
-        mg_definitions = cursor.fetchone()['count']
-        cursor.execute("SELECT COUNT(*) as count FROM subgroup_definitions")
-        sg_definitions = cursor.fetchone()['count']
-        cursor.execute("SELECT COUNT(*) as count FROM vehicle_main_groups")
-        vehicle_mgs = cursor.fetchone()['count']
-        cursor.execute("SELECT COUNT(*) as count FROM vehicle_subgroups")
-        vehicle_sgs = cursor.fetchone()['count']
-        cursor.execute("SELECT COUNT(*) as count FROM diagrams")
-        diagrams = cursor.fetchone()['count']
-        cursor.execute("SELECT COUNT(*) as count FROM parts")
-        parts = cursor.fetchone()['count']
-        cursor.execute("SELECT COUNT(DISTINCT part_number) as count FROM parts WHERE part_number != ''")
-        unique_parts = cursor.fetchone()['count']
-        return {
-            "vehicles": vehicles,
-            "main_group_definitions": mg_definitions,
-            "subgroup_definitions": sg_definitions,
-            "vehicle_main_groups": vehicle_mgs,
-            "vehicle_subgroups": vehicle_sgs,
-            "diagrams": diagrams,
-            "parts": parts,
-            "unique_part_numbers": unique_parts
-        }
+        cursor.execute(_SQL_STATS)
+        return dict(zip([d[0] for d in cursor.description], cursor.fetchone()))
@@ -0,0 +1,55 @@
+import threading
+import time
+from functools import wraps
+
+# Every cache created by @cached registers here so re-ingest and tests can
+# invalidate the whole process in one call.
+_caches = []
+
+
+def cached(ttl, max_entries=1024):
+    """Memoize a function's successful results in-process for ttl seconds.
+
+    Keys on the call arguments, which suits handlers whose output is a pure
+    function of their path and query parameters. Exceptions (e.g. the
+    HTTPException raised for 404s) propagate without being cached.
+
+    The store is bounded: once it reaches max_entries, expired entries are
+    dropped and, if everything is still live, the oldest insertions are
+    evicted. Request-derived keys (search terms, order codes) therefore
+    cannot grow worker memory without limit.
+    """
+    def decorator(func):
+        store = {}
+        lock = threading.Lock()
+        _caches.append(store)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with lock:
+                hit = store.get(key)
+                if hit is not None and now < hit[1]:
+                    return hit[0]
+            value = func(*args, **kwargs)
+            with lock:
+                if len(store) >= max_entries:
+                    for k in [k for k, (_, exp) in store.items() if now >= exp]:
+                        del store[k]
+                    # Dicts iterate in insertion order, so this drops the
+                    # oldest entries when none have expired yet.
+                    while len(store) >= max_entries:
+                        del store[next(iter(store))]
+                store[key] = (value, now + ttl)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def clear_all():
+    """Drop every registered cache (catalog re-ingest, tests)"""
+    for store in _caches:
+        store.clear()
@@ -1,15 +1,338 @@
+import json
+import queue
+import re
 import sqlite3
+import threading
 from contextlib import contextmanager
 
 DB_PATH = "bmw_parts.db"
+POOL_SIZE = 5
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Applied once per pooled connection, not per request. WAL keeps readers
+# from blocking on writer fsyncs; the 128 MB page cache holds the hot
+# working set across requests, and the 1 GiB mmap window lets repeated
+# scans read mapped pages instead of issuing pread() per page.
+_CONNECTION_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA cache_size=-131072;
+    PRAGMA temp_store=memory;
+    PRAGMA mmap_size=1073741824;
+    PRAGMA foreign_keys=ON;
+"""
+
+
+def _connect():
+    # isolation_level=None leaves sqlite3 in autocommit so the driver stops
+    # wrapping reads in implicit BEGIN/COMMIT pairs.
+    conn = sqlite3.connect(
+        DB_PATH, check_same_thread=False, cached_statements=512,
+        isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_CONNECTION_PRAGMAS)
+    return conn
+
+
+# Indexes for the foreign-key/filter columns every endpoint joins on.
+# (table, index name, indexed columns)
+_INDEXES = [
+    ("vehicle_main_groups", "idx_vmg_vid", "vid"),
+    ("vehicle_subgroups", "idx_vsg_mg", "vehicle_mg_id"),
+    ("diagrams", "idx_diag_vsg", "vehicle_subgroup_id"),
+    ("parts", "idx_parts_diag", "diagram_id"),
+    ("parts", "idx_parts_partnumber", "part_number"),
+    ("main_group_definitions", "idx_mgd_num", "mg_number_int"),
+    ("subgroup_definitions", "idx_sgd_num", "sg_number_int"),
+    ("vehicle_main_groups", "idx_vmg_num", "mg_number_int"),
+    ("parts", "idx_parts_pos", "position_int"),
+    # Composite indexes matching the join+filter shape of the context
+    # lookups, so each join step is an index walk rather than a scan.
+    ("parts", "idx_parts_pn_diag", "part_number, diagram_id"),
+    ("vehicle_subgroups", "idx_vsg_mg_sgdef", "vehicle_mg_id, sg_definition_id"),
+    ("vehicle_main_groups", "idx_vmg_vid_mg", "vid, mg_number"),
+    ("subgroup_definitions", "idx_sgd_sg_mg", "sg_number, mg_number"),
+    # Join + ORDER BY pairs, so the child lookup and its sort share one
+    # index walk.
+    ("diagrams", "idx_diag_vsg_title", "vehicle_subgroup_id, title"),
+    ("subgroup_definitions", "idx_sgd_mg_num", "mg_number, sg_number_int"),
+    ("parts", "idx_parts_diag_pos", "diagram_id, position_int"),
+]
+
+# Numeric shadow columns for TEXT columns the API orders on. Generated
+# virtual columns keep them in sync for free, and the indexes above make
+# ORDER BY an index walk instead of a per-row CAST plus filesort.
+# (table, column name, generating expression)
+_NUMERIC_COLUMNS = [
+    ("main_group_definitions", "mg_number_int", "CAST(mg_number AS INTEGER)"),
+    ("subgroup_definitions", "mg_number_int", "CAST(mg_number AS INTEGER)"),
+    ("subgroup_definitions", "sg_number_int", "CAST(sg_number AS INTEGER)"),
+    ("vehicle_main_groups", "mg_number_int", "CAST(mg_number AS INTEGER)"),
+    ("parts", "position_int", "CAST(position AS INTEGER)"),
+]
+
+
+# Matches one CODE=Value token of a legacy option_codes string; a single
+# findall pass replaces the per-token strip/split/len dance.
+_OPTION_CODE_RE = re.compile(r"(\S+?)=(\S+)")
+
+
+def _migrate_option_codes(conn):
+    """Rewrite legacy space/=-delimited option_codes strings as JSON objects.
+
+    Storing the parsed form lets queries filter parts in SQL via json_each
+    instead of re-parsing the raw string in Python on every request.
+    """
+    cursor = conn.execute(
+        "SELECT id, option_codes FROM parts "
+        "WHERE option_codes IS NOT NULL AND json_valid(option_codes) = 0"
+    )
+    updates = [
+        (json.dumps(dict(_OPTION_CODE_RE.findall(raw))), part_id)
+        for part_id, raw in cursor.fetchall()
+    ]
+    if updates:
+        conn.executemany("UPDATE parts SET option_codes = ? WHERE id = ?", updates)
+
+
+# Full-text index over the searchable parts columns. External-content keeps
+# the token index small (row data stays in parts); the triggers keep it in
+# sync with ingestion writes. The trigram tokenizer gives true substring
+# matching ('ntrol' finds 'Control Module'), preserving the old %q% LIKE
+# semantics at index speed.
+_FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS parts_fts USING fts5(
+        description, part_number, content='parts', content_rowid='id',
+        tokenize='trigram');
+    CREATE TRIGGER IF NOT EXISTS parts_fts_ai AFTER INSERT ON parts BEGIN
+        INSERT INTO parts_fts(rowid, description, part_number)
+        VALUES (new.id, new.description, new.part_number);
+    END;
+    CREATE TRIGGER IF NOT EXISTS parts_fts_ad AFTER DELETE ON parts BEGIN
+        INSERT INTO parts_fts(parts_fts, rowid, description, part_number)
+        VALUES ('delete', old.id, old.description, old.part_number);
+    END;
+    CREATE TRIGGER IF NOT EXISTS parts_fts_au AFTER UPDATE ON parts BEGIN
+        INSERT INTO parts_fts(parts_fts, rowid, description, part_number)
+        VALUES ('delete', old.id, old.description, old.part_number);
+        INSERT INTO parts_fts(rowid, description, part_number)
+        VALUES (new.id, new.description, new.part_number);
+    END;
+"""
+
+
+def _ensure_parts_fts(conn):
+    # Databases indexed before the trigram switch carry the old tokenizer;
+    # drop and re-index them (the docsize mismatch below forces the rebuild).
+    existing = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'parts_fts'"
+    ).fetchone()
+    if existing and "trigram" not in existing[0]:
+        conn.execute("DROP TABLE parts_fts")
+    conn.executescript(_FTS_SCHEMA)
+    # COUNT(*) on an external-content FTS table reads the content table, so
+    # gauge the index itself via its docsize shadow table; a mismatch means
+    # parts was written before the triggers existed and we must rebuild.
+    fts_rows = conn.execute("SELECT COUNT(*) FROM parts_fts_docsize").fetchone()[0]
+    part_rows = conn.execute("SELECT COUNT(*) FROM parts").fetchone()[0]
+    if fts_rows != part_rows:
+        conn.execute("INSERT INTO parts_fts(parts_fts) VALUES('rebuild')")
+
+
+# Denormalized copy of each part with its diagram/subgroup/main-group/vehicle
+# context, so the per-part lookup endpoints are single-table reads instead of
+# repeating the same six-way join per request. Rebuilt from scratch whenever
+# the row count drifts from parts (i.e. after ingest).
+_PARTS_CONTEXT_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS parts_context (
+        id INTEGER PRIMARY KEY,
+        position TEXT, description TEXT, part_number TEXT, quantity TEXT,
+        supplement TEXT, from_date TEXT, up_to_date TEXT, price TEXT,
+        notes TEXT, option_requirements TEXT, option_codes TEXT,
+        diagram_title TEXT, diagram_id TEXT, sg_name TEXT, mg_name TEXT,
+        vehicle_vid TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_pc_part_number ON parts_context(part_number);
+    CREATE INDEX IF NOT EXISTS idx_pc_vid ON parts_context(vehicle_vid);
+"""
+
+_SQL_PARTS_CONTEXT_FILL = """
+    INSERT INTO parts_context
+    SELECT p.id, p.position, p.description, p.part_number, p.quantity,
+           p.supplement, p.from_date, p.up_to_date, p.price, p.notes,
+           p.option_requirements, p.option_codes,
+           d.title, d.diagram_id, sgd.sg_name, mgd.mg_name, vmg.vid
+    FROM parts p
+    JOIN diagrams d ON p.diagram_id = d.id
+    JOIN vehicle_subgroups vsg ON d.vehicle_subgroup_id = vsg.id
+    JOIN subgroup_definitions sgd ON vsg.sg_definition_id = sgd.id
+    JOIN vehicle_main_groups vmg ON vsg.vehicle_mg_id = vmg.id
+    JOIN main_group_definitions mgd ON vmg.mg_number = mgd.mg_number
+"""
+
+
+# One row per (part, option code), extracted from the JSON option_codes
+# objects, so option lookups are equality probes on an index instead of a
+# LIKE pattern scan over every part.
+_PART_OPTIONS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS part_options (
+        part_id INTEGER NOT NULL,
+        option_code TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_po_code ON part_options(option_code, part_id);
+"""
+
+_SQL_PART_OPTIONS_FILL = """
+    INSERT INTO part_options (part_id, option_code)
+    SELECT p.id, je.key
+    FROM parts p, json_each(p.option_codes) je
+"""
+
+
+def _ensure_part_options(conn):
+    conn.executescript(_PART_OPTIONS_SCHEMA)
+    option_rows = conn.execute("SELECT COUNT(*) FROM part_options").fetchone()[0]
+    source_rows = conn.execute(
+        "SELECT COUNT(*) FROM parts p, json_each(p.option_codes)"
+    ).fetchone()[0]
+    if option_rows != source_rows:
+        conn.execute("DELETE FROM part_options")
+        conn.execute(_SQL_PART_OPTIONS_FILL)
+
+
+# Materialized distinct part numbers with reference counts, so /stats reads
+# COUNT(*) off a small table instead of sorting every part_number. The
+# triggers keep the counts in step with ingestion writes.
+_PART_NUMBER_REGISTRY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS part_number_registry (
+        part_number TEXT PRIMARY KEY,
+        ref_count INTEGER NOT NULL
+    );
+    CREATE TRIGGER IF NOT EXISTS pnr_ai AFTER INSERT ON parts
+    WHEN new.part_number != '' BEGIN
+        INSERT INTO part_number_registry (part_number, ref_count)
+        VALUES (new.part_number, 1)
+        ON CONFLICT(part_number) DO UPDATE SET ref_count = ref_count + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS pnr_ad AFTER DELETE ON parts
+    WHEN old.part_number != '' BEGIN
+        UPDATE part_number_registry SET ref_count = ref_count - 1
+        WHERE part_number = old.part_number;
+        DELETE FROM part_number_registry
+        WHERE part_number = old.part_number AND ref_count <= 0;
+    END;
+"""
+
+_SQL_PART_NUMBER_REGISTRY_FILL = """
+    INSERT INTO part_number_registry (part_number, ref_count)
+    SELECT part_number, COUNT(*) FROM parts
+    WHERE part_number != ''
+    GROUP BY part_number
+"""
+
+
+def _ensure_part_number_registry(conn):
+    conn.executescript(_PART_NUMBER_REGISTRY_SCHEMA)
+    registry_total = conn.execute(
+        "SELECT COALESCE(SUM(ref_count), 0) FROM part_number_registry"
+    ).fetchone()[0]
+    part_total = conn.execute(
+        "SELECT COUNT(*) FROM parts WHERE part_number != ''"
+    ).fetchone()[0]
+    if registry_total != part_total:
+        conn.execute("DELETE FROM part_number_registry")
+        conn.execute(_SQL_PART_NUMBER_REGISTRY_FILL)
+
+
+# Pre-rendered complete-structure payloads, one JSON body per vehicle.
+# Written by the admin refresh endpoint after ingest; the unfiltered
+# /complete read becomes a point lookup that streams the stored bytes.
+_COMPLETE_SNAPSHOT_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS vehicle_complete_json (
+        vid TEXT PRIMARY KEY,
+        payload TEXT NOT NULL,
+        refreshed_at TEXT NOT NULL DEFAULT (datetime('now'))
+    );
+"""
+
+
+# Tables the fill query joins; skip the rebuild until all of them exist.
+_PARTS_CONTEXT_SOURCES = {
+    "parts", "diagrams", "vehicle_subgroups", "subgroup_definitions",
+    "vehicle_main_groups", "main_group_definitions",
+}
+
+
+def _ensure_parts_context(conn):
+    conn.executescript(_PARTS_CONTEXT_SCHEMA)
+    context_rows = conn.execute("SELECT COUNT(*) FROM parts_context").fetchone()[0]
+    part_rows = conn.execute("SELECT COUNT(*) FROM parts").fetchone()[0]
+    if context_rows != part_rows:
+        conn.execute("DELETE FROM parts_context")
+        conn.execute(_SQL_PARTS_CONTEXT_FILL)
+
+
+def ensure_schema(conn):
+    """Create performance indexes and shadow columns for existing tables.
+
+    Idempotent; skips tables that do not exist yet so it is safe to run
+    against an empty or partially-built database.
+    """
+    tables = {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    }
+    for table, column, expression in _NUMERIC_COLUMNS:
+        if table not in tables:
+            continue
+        # table_xinfo, not table_info: the latter omits generated columns,
+        # which would make this guard re-ALTER on every start against an
+        # already-migrated database and fail with "duplicate column name".
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+        if column not in existing:
+            conn.execute(
+                f"ALTER TABLE {table} ADD COLUMN {column} INTEGER "
+                f"GENERATED ALWAYS AS ({expression}) VIRTUAL"
+            )
+    for table, name, columns in _INDEXES:
+        if table in tables:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+    if "parts" in tables:
+        _migrate_option_codes(conn)
+        _ensure_parts_fts(conn)
+        _ensure_part_options(conn)
+        _ensure_part_number_registry(conn)
+        if _PARTS_CONTEXT_SOURCES <= tables:
+            _ensure_parts_context(conn)
+    conn.executescript(_COMPLETE_SNAPSHOT_SCHEMA)
+    # Refresh planner statistics so the new indexes actually get picked.
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def _get_pool():
+    """Lazily build the process-wide connection pool on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = queue.LifoQueue(maxsize=POOL_SIZE)
+                for _ in range(POOL_SIZE):
+                    pool.put(_connect())
+                ensure_schema(pool.queue[0])
+                _pool = pool
+    return _pool
 
 
 @contextmanager
 def get_db():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Context manager yielding a pooled database connection"""
+    pool = _get_pool()
+    conn = pool.get()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.put(conn)
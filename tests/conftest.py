@@ -1,28 +1,22 @@
+import hashlib
 import os
-import sys
 import sqlite3
-from contextlib import contextmanager
-from pathlib import Path
 
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 
-# Ensure src is importable
-HERE = os.path.dirname(__file__)
-SRC_DIR = os.path.abspath(os.path.join(HERE, '..', 'src'))
-
-if SRC_DIR not in sys.path:
-    sys.path.insert(0, SRC_DIR)
-
+# src is importable via the pythonpath setting in pytest.ini
 import main
+import routers.v1 as routers_v1
 import services.db as services_db
 
 
-def init_db(conn: sqlite3.Connection):
-    cursor = conn.cursor()
+# Minimal schema and seed data used by tests, interned once at import
+# instead of rebuilt inside every init_db call.
+_SEED_SQL = r"""
+    BEGIN IMMEDIATE;
 
-    # Create minimal schema used by tests
-    cursor.executescript(r"""
     CREATE TABLE vehicles (
         vid TEXT PRIMARY KEY,
         series TEXT,
@@ -84,66 +78,175 @@ def init_db(conn: sqlite3.Connection):
         option_requirements TEXT,
         option_codes TEXT
     );
-    """)
-
-    # Seed basic data (populate all fields required by response model)
-    cursor.execute(
-        "INSERT INTO vehicles (vid, series, body, model, market, prod_month, engine, steering, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        ("TESTVID", "3", "Sedan", "330i", "US", "2026-02", "B48", "LHD", "2026-02-15")
-    )
-    cursor.execute("INSERT INTO main_group_definitions (mg_number, mg_name) VALUES (?, ?)", ("11", "Engine"))
-    cursor.execute("INSERT INTO vehicle_main_groups (vid, mg_number, url) VALUES (?, ?, ?)", ("TESTVID", "11", "/mg/11"))
-    vmg_id = cursor.lastrowid
-    cursor.execute("INSERT INTO subgroup_definitions (mg_number, sg_number, sg_name) VALUES (?, ?, ?)", ("11", "10", "Engine Sub"))
-    sg_def_id = cursor.lastrowid
-    cursor.execute("INSERT INTO vehicle_subgroups (vehicle_mg_id, sg_definition_id) VALUES (?, ?)", (vmg_id, sg_def_id))
-    vsg_id = cursor.lastrowid
-    cursor.execute("INSERT INTO diagrams (vehicle_subgroup_id, diagram_id, title, url) VALUES (?, ?, ?, ?)", (vsg_id, "D1", "Main Diagram", "/d/1"))
-    diagram_id = cursor.lastrowid
-    # Part with option codes
-    cursor.execute(
-        "INSERT INTO parts (diagram_id, position, description, part_number, quantity, supplement, from_date, up_to_date, price, notes, option_requirements, option_codes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (diagram_id, "1", "Control Module", "1234", "1", "", "2020-01", "", "150.00", "", None, "S710A=Yes")
-    )
-    # Part without option codes
-    cursor.execute(
-        "INSERT INTO parts (diagram_id, position, description, part_number, quantity, supplement, from_date, up_to_date, price, notes, option_requirements, option_codes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (diagram_id, "2", "Universal Part", "5678", "1", "", "2020-01", "", "50.00", "", None, None)
-    )
-
-    conn.commit()
-
-
-@contextmanager
-def get_db_override(conn: sqlite3.Connection):
-    try:
-        yield conn
-    finally:
-        pass
+
+    -- Seed basic data (populate all fields required by response models).
+    -- IDs are hard-coded so the whole seed runs in one executescript call
+    -- instead of a per-row execute() plus lastrowid round trip.
+    INSERT INTO vehicles (vid, series, body, model, market, prod_month, engine, steering, created_at)
+    VALUES ('TESTVID', '3', 'Sedan', '330i', 'US', '2026-02', 'B48', 'LHD', '2026-02-15');
+
+    INSERT INTO main_group_definitions (mg_number, mg_name) VALUES ('11', 'Engine');
+    INSERT INTO vehicle_main_groups (id, vid, mg_number, url) VALUES (1, 'TESTVID', '11', '/mg/11');
+    INSERT INTO subgroup_definitions (id, mg_number, sg_number, sg_name) VALUES (1, '11', '10', 'Engine Sub');
+    INSERT INTO vehicle_subgroups (id, vehicle_mg_id, sg_definition_id) VALUES (1, 1, 1);
+    INSERT INTO diagrams (id, vehicle_subgroup_id, diagram_id, title, url) VALUES (1, 1, 'D1', 'Main Diagram', '/d/1');
+
+    INSERT INTO parts (diagram_id, position, description, part_number, quantity, supplement, from_date, up_to_date, price, notes, option_requirements, option_codes)
+    VALUES
+        (1, '1', 'Control Module', '1234', '1', '', '2020-01', '', '150.00', '', NULL, 'S710A=Yes'),
+        (1, '2', 'Universal Part', '5678', '1', '', '2020-01', '', '50.00', '', NULL, NULL);
+
+    COMMIT;
+"""
+
+
+def init_db(conn: sqlite3.Connection):
+    conn.executescript(_SEED_SQL)
+    # Mirror the index/migration setup the app applies to the real database
+    services_db.ensure_schema(conn)
+
+
+class _StaticConn:
+    """Context manager handing out one fixed connection.
+
+    The handlers enter get_db() per request; a reusable instance with plain
+    __enter__/__exit__ avoids allocating a @contextmanager generator and its
+    try/finally frame on every call.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __enter__(self):
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+# Throwaway databases: drop every durability guarantee so the seed
+# inserts and any write paths the tests exercise skip journal and
+# sync bookkeeping entirely.
+_TEST_PRAGMAS = """
+    PRAGMA journal_mode=MEMORY;
+    PRAGMA synchronous=OFF;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-20000;
+"""
+
+
+def _new_test_conn():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    # Autocommit mode, like the app's pooled connections: the driver stops
+    # injecting implicit BEGINs and init_db controls its own transaction.
+    conn.isolation_level = None
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_TEST_PRAGMAS)
+    return conn
+
+
+@pytest.fixture(scope="session")
+def _template_bytes(request):
+    # Seed one template database — DDL, inserts and the ensure_schema()
+    # work (FTS build, ANALYZE) run once — and keep its serialized image.
+    # Each test deserializes a copy, which is a bulk page copy rather than
+    # a re-run of the schema script.
+    #
+    # The image is also cached on disk under pytest's cache directory so
+    # later pytest invocations (and xdist workers) skip the seeding
+    # entirely: SQLite's serialized form is the database file format, so
+    # the file bytes feed deserialize() directly. The filename is keyed by
+    # the seed script and services/db.py, so schema changes miss the cache
+    # instead of serving a stale image.
+    # config.cache is unset under -p no:cacheprovider; seed in-process then.
+    cache = getattr(request.config, "cache", None)
+    seed_path = None
+    if cache is not None:
+        with open(services_db.__file__, "rb") as f:
+            schema_src = f.read()
+        digest = hashlib.blake2b(
+            _SEED_SQL.encode() + schema_src, digest_size=8).hexdigest()
+        seed_dir = cache.mkdir("seed_db")
+        seed_path = seed_dir / f"seed-{digest}.sqlite"
+        if seed_path.exists():
+            return seed_path.read_bytes()
+
+    template = _new_test_conn()
+    init_db(template)
+    data = template.serialize()
+    template.close()
+
+    if seed_path is not None:
+        # Write-then-rename keeps concurrent workers from reading a torn file.
+        tmp_path = seed_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, seed_path)
+    return data
 
 
 @pytest.fixture
-def client(tmp_path):
-    # Create a single in-memory connection and seed it
-    # Allow the in-memory sqlite connection to be used from FastAPI test server threads
+def _conn(_template_bytes):
+    # A genuinely private database per test: deserialize the seeded image
+    # into a fresh connection and point the app's get_db at it. The
+    # handlers call the module-global get_db() directly rather than taking
+    # it as a Depends() parameter, so app.dependency_overrides never sees
+    # it; rewire the module references instead.
     conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.isolation_level = None
     conn.row_factory = sqlite3.Row
-    init_db(conn)
-
-    # Monkeypatch the application's get_db to use the in-memory connection
-    # The routers import `get_db` from `services.db` at import time, so override
-    # both the services module and the router module references.
-    services_db.get_db = lambda: get_db_override(conn)
-    try:
-        import routers.v1 as routers_v1
-        routers_v1.get_db = lambda: get_db_override(conn)
-    except Exception:
-        # If routers are not imported yet, main import will pull them in later.
-        pass
-    # Also override main.get_db if present
-    try:
-        main.get_db = lambda: get_db_override(conn)
-    except Exception:
-        pass
+    conn.deserialize(_template_bytes)
+
+    cm = _StaticConn(conn)
+
+    def override():
+        return cm
+
+    for module in (services_db, routers_v1, main):
+        module.get_db = override
 
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="session")
+def _client():
+    # Building a TestClient walks the whole router and sets up an httpx
+    # transport; do it once and let each test reuse the same instance.
+    # (Instantiating without a `with` block skips lifespan startup, so the
+    # background stats refresher never runs during tests.)
     return TestClient(main.app)
+
+
+@pytest.fixture
+def client(_conn, _client):
+    # Lookup caches would otherwise leak results across per-test databases
+    routers_v1.clear_caches()
+    return _client
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _warm_openapi_schema():
+    # Generating the OpenAPI document finalizes the route table and builds
+    # every Pydantic model schema; doing it once here keeps that cost out
+    # of whichever test happens to send the first request.
+    main.app.openapi()
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+# One transport for the session; it holds no per-request state.
+_ASGI_TRANSPORT = httpx.ASGITransport(app=main.app)
+
+
+@pytest.fixture
+async def aclient(_conn):
+    # Talks to the app in-process over ASGI without TestClient's
+    # sync-to-async portal, so each request is a plain awaited call.
+    routers_v1.clear_caches()
+    async with httpx.AsyncClient(
+        transport=_ASGI_TRANSPORT, base_url="http://test"
+    ) as ac:
+        yield ac
@@ -1,24 +1,42 @@
-def test_root_endpoint(client):
-    response = client.get("/")
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+# Pure status-code checks share one parametrized test so pytest builds a
+# single item template instead of a function per case.
+@pytest.mark.parametrize("path,params,expected_status", [
+    ("/vehicles/TESTVID", None, 200),
+    ("/vehicles/NO_SUCH_VID", None, 404),
+    ("/parts/search", {"q": "aa"}, 422),
+    ("/options/S710A", None, 200),
+    ("/options/S999", None, 404),
+    ("/subgroups/definitions", None, 200),
+    ("/parts", {"numbers": ""}, 400),
+    ("/options", {"codes": " , "}, 400),
+    ("/main-groups/11/vehicles", {"fields": "no_such_column"}, 400),
+])
+async def test_endpoint_status_codes(aclient, path, params, expected_status):
+    response = await aclient.get(path, params=params)
+    assert response.status_code == expected_status
+
+
+async def test_root_endpoint(aclient):
+    response = await aclient.get("/")
     assert response.status_code == 200
     data = response.json()
     assert "BMW Parts API" in data["message"]
 
 
-def test_get_vehicle_not_found(client):
-    response = client.get("/vehicles/NO_SUCH_VID")
-    assert response.status_code == 404
-
-
-def test_get_vehicle_success(client):
-    response = client.get("/vehicles/TESTVID")
+async def test_get_vehicle_success(aclient):
+    response = await aclient.get("/vehicles/TESTVID")
     assert response.status_code == 200
     data = response.json()
     assert data["vid"] == "TESTVID"
 
 
-def test_search_parts_success(client):
-    response = client.get("/parts/search", params={"q": "Control"})
+async def test_search_parts_success(aclient):
+    response = await aclient.get("/parts/search", params={"q": "Control"})
     assert response.status_code == 200
     data = response.json()
     assert data["total"] >= 1
@@ -26,19 +44,51 @@ def test_search_parts_success(client):
     assert any(p["description"] == "Control Module" for p in parts)
 
 
-def test_search_parts_invalid_query_too_short(client):
-    response = client.get("/parts/search", params={"q": "aa"})
-    assert response.status_code == 422
-
-
-def test_get_parts_by_option_success(client):
-    response = client.get("/options/S710A")
+async def test_get_parts_by_option_success(aclient):
+    response = await aclient.get("/options/S710A")
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
     assert any(p["part_number"] == "1234" for p in data)
 
 
-def test_get_parts_by_option_not_found(client):
-    response = client.get("/options/S999")
+async def test_get_parts_batch(aclient):
+    response = await aclient.get("/parts", params={"numbers": "1234,9999"})
+    assert response.status_code == 200
+    data = response.json()
+    assert any(p["description"] == "Control Module" for p in data["1234"])
+    assert data["9999"] == []
+
+
+async def test_get_options_batch(aclient):
+    response = await aclient.get("/options", params={"codes": "S710A,S999"})
+    assert response.status_code == 200
+    data = response.json()
+    assert any(p["part_number"] == "1234" for p in data["S710A"])
+    assert data["S999"] == []
+
+
+async def test_vehicles_by_main_group_fields(aclient):
+    response = await aclient.get(
+        "/main-groups/11/vehicles", params={"fields": "vid"})
+    assert response.status_code == 200
+    assert response.json() == [{"vid": "TESTVID"}]
+
+
+def test_sync_client_smoke(client):
+    # Keeps the session TestClient and its fixture (including the
+    # per-test cache clearing) exercised alongside the ASGI tests.
+    response = client.get("/vehicles/TESTVID")
+    assert response.status_code == 200
+    assert response.json()["vid"] == "TESTVID"
+
+
+async def test_admin_refresh_snapshot(aclient):
+    response = await aclient.post("/admin/refresh/TESTVID")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["vid"] == "TESTVID"
+    assert data["bytes"] > 0
+
+    response = await aclient.post("/admin/refresh/NO_SUCH_VID")
     assert response.status_code == 404
@@ -0,0 +1,15 @@
+import services.db as services_db
+
+from conftest import _new_test_conn, init_db
+
+
+def test_ensure_schema_idempotent():
+    # Simulates a second process start against an already-migrated
+    # database. The generated-column guard must see the VIRTUAL columns
+    # added on the first run (PRAGMA table_info omits them; only
+    # table_xinfo reports them), or the ALTER TABLE re-runs and fails
+    # with "duplicate column name".
+    conn = _new_test_conn()
+    init_db(conn)
+    services_db.ensure_schema(conn)
+    conn.close()